@@ -15,6 +15,6 @@ v = page.add('example', ui.plot_card(
     plot=ui.plot([ui.mark(type='line', x_scale='time', x='=date', y='=price', color='=product', y_min=0)])
 ))
 
-v.data = [(g, t, x) for x in [f.next() for _ in range(n)] for g, t, x, dx in x]
+v.data = [(g, t, x) for batch in (f.next() for _ in range(n)) for g, t, x, dx in batch]
 
 page.save()
@@ -12,7 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import secrets
 import warnings
 import logging
@@ -23,6 +27,11 @@ from typing import List, Dict, Union, Tuple, Any, Optional, IO
 
 import httpx
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 Primitive = Union[bool, str, int, float, None]
@@ -42,6 +51,12 @@ _default_internal_address = 'http://127.0.0.1:8000'
 
 
 class _Config:
+    # Read once at import; the process environment is never consulted again after this snapshot.
+    __slots__ = (
+        'internal_address', 'app_address', 'app_mode', 'hub_address',
+        'hub_access_key_id', 'hub_access_key_secret', 'app_access_key_id', 'app_access_key_secret',
+    )
+
     def __init__(self):
         self.internal_address = _get_env('INTERNAL_ADDRESS', _default_internal_address)
         self.app_address = _get_env('APP_ADDRESS', _get_env('EXTERNAL_ADDRESS', self.internal_address))
@@ -57,6 +72,13 @@ _config = _Config()
 
 _key_sep = ' '
 _content_type_json = {'Content-type': 'application/json'}
+_connection_limits = httpx.Limits(max_connections=32)
+_download_buffer_size = 1024 * 1024
+
+
+# Hoisted so the hot-path isinstance() checks below don't rebuild these tuples on every call.
+_list_types = (list, tuple)
+_primitive_types = (bool, str, int, float)
 
 
 def _is_int(x: Any) -> bool: return isinstance(x, int)
@@ -65,10 +87,10 @@ def _is_int(x: Any) -> bool: return isinstance(x, int)
 def _is_str(x: Any) -> bool: return isinstance(x, str)
 
 
-def _is_list(x: Any) -> bool: return isinstance(x, (list, tuple))
+def _is_list(x: Any) -> bool: return isinstance(x, _list_types)
 
 
-def _is_primitive(x: Any) -> bool: return x is None or isinstance(x, (bool, str, int, float))
+def _is_primitive(x: Any) -> bool: return x is None or isinstance(x, _primitive_types)
 
 
 def _guard_primitive(x: Any):
@@ -98,10 +120,15 @@ def _guard_primitive_dict_values(d: Dict[str, Any]):
             _guard_primitive(x)
 
 
+@lru_cache(maxsize=1024)
+def _is_valid_str_key(key: str) -> bool:
+    return ' ' not in key
+
+
 def _guard_str_key(key: str):
     if not _is_str(key):
         raise KeyError('key must be str')
-    if ' ' in key:
+    if not _is_valid_str_key(key):
         raise KeyError('keys cannot contain spaces')
 
 
@@ -117,7 +144,9 @@ class ServiceError(Exception):
     pass
 
 
-DICT = '__kv'
+# Name of the slot holding the backing dict. A single leading underscore: double-underscore
+# names in __slots__ get mangled, which would break the getattr()-based access below.
+DICT = '_kv'
 
 
 class Expando:
@@ -128,26 +157,28 @@ class Expando:
         args: An optional ``dict`` of attribute-value pairs to initialize the expando instance with.
     """
 
+    __slots__ = (DICT,)
+
     def __init__(self, args: Optional[Dict] = None):
-        self.__dict__[DICT] = args if isinstance(args, dict) else dict()
+        object.__setattr__(self, DICT, args if isinstance(args, dict) else dict())
 
-    def __getattr__(self, k): return self.__dict__[DICT].get(k)
+    def __getattr__(self, k): return getattr(self, DICT).get(k)
 
-    def __getitem__(self, k): return self.__dict__[DICT].get(k)
+    def __getitem__(self, k): return getattr(self, DICT).get(k)
 
-    def __setattr__(self, k, v): self.__dict__[DICT][k] = v
+    def __setattr__(self, k, v): getattr(self, DICT)[k] = v
 
-    def __setitem__(self, k, v): self.__dict__[DICT][k] = v
+    def __setitem__(self, k, v): getattr(self, DICT)[k] = v
 
-    def __contains__(self, k): return k in self.__dict__[DICT]
+    def __contains__(self, k): return k in getattr(self, DICT)
 
-    def __delattr__(self, k): del self.__dict__[DICT][k]
+    def __delattr__(self, k): del getattr(self, DICT)[k]
 
-    def __delitem__(self, k): del self.__dict__[DICT][k]
+    def __delitem__(self, k): del getattr(self, DICT)[k]
 
-    def __repr__(self): return repr(self.__dict__[DICT])
+    def __repr__(self): return repr(getattr(self, DICT))
 
-    def __str__(self): return ', '.join([f'{k}:{repr(v)}' for k, v in self.__dict__[DICT].items()])
+    def __str__(self): return ', '.join([f'{k}:{repr(v)}' for k, v in getattr(self, DICT).items()])
 
 
 def expando_to_dict(e: Expando) -> dict:
@@ -162,7 +193,7 @@ def expando_to_dict(e: Expando) -> dict:
         The expando's dictionary.
 
     """
-    return e.__dict__[DICT]
+    return getattr(e, DICT)
 
 
 def clone_expando(source: Expando, exclude_keys: Optional[Union[list, tuple]] = None,
@@ -219,14 +250,9 @@ KEY = '__key__'
 
 
 def _set_op(o, k, v):
+    # Ref's setters reject Data values up front, so v is always a plain (already dumped) value.
     _guard_key(k)
-    k = getattr(o, KEY) + _key_sep + str(k)
-    if isinstance(v, Data):
-        op = v.dump()
-        op['k'] = k
-    else:
-        op = dict(k=k, v=v)
-    return op
+    return dict(k=f'{o.__dict__[KEY]}{_key_sep}{k}', v=v)
 
 
 def _can_dump(x: Any):
@@ -241,18 +267,28 @@ def _is_numpy_obj(x: Any) -> bool:
     return False
 
 
-def _dump(xs: Any):
-    if _is_numpy_obj(xs):
-        raise ValueError('NumPy objects are not serializable by Wave')
+# Exact types only: NumPy scalars subclass int/float and must not take the fast path below.
+_scalar_types = {bool, int, float, str}
+
 
-    if isinstance(xs, (list, tuple)):
+def _dump(xs: Any):
+    # Scalars dominate the op stream; return them without touching the slower checks.
+    if xs is None or type(xs) in _scalar_types:
+        return xs
+    if isinstance(xs, _list_types):
+        # Rows are typically flat lists of scalars; one inline scan plus a C-level copy
+        # is cheaper than recursing into _dump once per element.
+        if all(x is None or type(x) in _scalar_types for x in xs):
+            return list(xs)
         return [_dump(x) for x in xs]
-    elif isinstance(xs, dict):
+    if isinstance(xs, dict):
         return {k: _dump(v) for k, v in xs.items()}
-    elif _can_dump(xs):
+    # NumPy objects expose a dump() of their own, so reject them before the _can_dump check.
+    if _is_numpy_obj(xs):
+        raise ValueError('NumPy objects are not serializable by Wave')
+    if _can_dump(xs):
         return xs.dump()
-    else:
-        return xs
+    return xs
 
 
 class Ref:
@@ -267,21 +303,23 @@ class Ref:
 
     def __getattr__(self, key):
         _guard_key(key)
-        return Ref(getattr(self, PAGE), getattr(self, KEY) + _key_sep + key)
+        d = self.__dict__
+        return Ref(d[PAGE], f'{d[KEY]}{_key_sep}{key}')
 
     def __getitem__(self, key):
         _guard_key(key)
-        return Ref(getattr(self, PAGE), getattr(self, KEY) + _key_sep + str(key))
+        d = self.__dict__
+        return Ref(d[PAGE], f'{d[KEY]}{_key_sep}{key}')
 
     def __setattr__(self, key, value):
         if isinstance(value, Data):
             raise ValueError('Data instances cannot be used in assignments.')
-        getattr(self, PAGE)._track(_set_op(self, key, _dump(value)))
+        self.__dict__[PAGE]._track(_set_op(self, key, _dump(value)))
 
     def __setitem__(self, key, value):
         if isinstance(value, Data):
             raise ValueError('Data instances cannot be used in assignments.')
-        getattr(self, PAGE)._track(_set_op(self, key, _dump(value)))
+        self.__dict__[PAGE]._track(_set_op(self, key, _dump(value)))
 
 
 class Data:
@@ -299,7 +337,19 @@ class Data:
         self.data = data
         self.size = size
 
+    def __setattr__(self, k, v):
+        self.__dict__[k] = v
+        self.__dict__['_cached_dump'] = None
+
     def dump(self):
+        cached = self.__dict__.get('_cached_dump')
+        if cached is None:
+            cached = self._dump()
+            self.__dict__['_cached_dump'] = cached
+        # Return a copy of the top-level dict: callers annotate it in place (e.g. with the op key).
+        return dict(cached)
+
+    def _dump(self):
         f = self.fields
         d = self.data
         n = self.size
@@ -380,10 +430,13 @@ def data(
             raise ValueError('rows must be list or dict')
     elif columns:  # transpose to rows
         # TODO issue warning: better for caller to use pack=True
+        if not _is_list(columns):
+            raise ValueError('columns must be list or tuple')
         n = len(columns[0])
-        rows = []
-        for i in range(n):
-            rows.append([c[i] for c in columns])
+        for column in columns:
+            if len(column) != n:
+                raise ValueError('columns must be of equal length')
+        rows = [list(row) for row in zip(*columns)]
 
     if not _is_int(size):
         raise ValueError('size must be int')
@@ -404,6 +457,7 @@ class _AsyncServerCache(_ServerCacheBase):
         self._http = httpx.AsyncClient(
             auth=(_config.hub_access_key_id, _config.hub_access_key_secret),
             verify=False,
+            limits=_connection_limits,
         )
 
     async def get(self, shard: str, key: str, default=None) -> Any:
@@ -428,6 +482,7 @@ class _ServerCache(_ServerCacheBase):
         self._http = httpx.Client(
             auth=(_config.hub_access_key_id, _config.hub_access_key_secret),
             verify=False,
+            limits=_connection_limits,
         )
 
     def get(self, shard: str, key: str, default=None):
@@ -457,7 +512,10 @@ class PageBase:
 
     def __init__(self, url: str):
         self.url = url
-        self._changes = []
+        # Pending ops, keyed by the op's target key so that re-writes to the same key replace
+        # the queued op instead of accumulating. Ops without a key get a unique int key.
+        self._changes = OrderedDict()
+        self._change_seq = 0
 
     def add(self, key: str, card: Any) -> Ref:
         """
@@ -481,31 +539,35 @@ class PageBase:
         if not isinstance(props, dict):
             raise ValueError('card must be dict or implement .dump() -> dict')
 
-        data = []
+        d = {}
         bufs = []
         for k, v in props.items():
             if isinstance(v, Data):
-                data.append((k, len(bufs)))
+                # Buffer props are renamed to '~prop' and hold the index of their buffer.
+                d[f'~{k}'] = len(bufs)
                 bufs.append(v.dump())
-
-        for k, v in data:
-            del props[k]
-            props[f'~{k}'] = v
+            else:
+                d[k] = v
 
         if len(bufs) > 0:
-            self._track(dict(k=key, d=props, b=bufs))
+            self._track(dict(k=key, d=d, b=bufs))
         else:
-            self._track(dict(k=key, d=props))
+            self._track(dict(k=key, d=d))
 
         return Ref(self, key)
 
     def _track(self, op: dict):
-        self._changes.append(op)
+        k = op.get('k')
+        if not k:
+            self._change_seq += 1
+            k = self._change_seq
+        self._changes[k] = op
+        self._changes.move_to_end(k)
 
     def _diff(self):
         if len(self._changes) == 0:
             return None
-        d = marshal(dict(d=self._changes))
+        d = _marshal_bytes(dict(d=list(self._changes.values())))
         self._changes.clear()
         return d
 
@@ -524,6 +586,11 @@ class PageBase:
 
     def __delitem__(self, key: str):
         _guard_str_key(key)
+        # Deleting a card makes any queued writes under it moot; discard them.
+        prefix = key + _key_sep
+        stale = [k for k in self._changes if isinstance(k, str) and (k == key or k.startswith(prefix))]
+        for k in stale:
+            del self._changes[k]
         self._track(dict(k=key))
 
 
@@ -562,7 +629,7 @@ class Page(PageBase):
         """
         p = self._diff()
         if p:
-            logger.debug(data)
+            logger.debug(p)
             self.site._save(self.url, p)
 
 
@@ -576,8 +643,12 @@ class AsyncPage(PageBase):
         url: The URL of this page.
     """
 
+    _save_delay = 0.016
+
     def __init__(self, site: 'AsyncSite', url: str):
         self.site = site
+        self._save_task: Optional[asyncio.Future] = None
+        self._skip_delay: Optional[asyncio.Event] = None
         super().__init__(url)
 
     async def load(self) -> dict:
@@ -596,14 +667,40 @@ class AsyncPage(PageBase):
         warnings.warn('page.push() is deprecated. Please use page.save() instead.', DeprecationWarning)
         await self.save()
 
-    async def save(self):
+    async def save(self, immediate: bool = False):
         """
         Save the page. Sends all local changes made to this page to the remote site.
+
+        Rapid concurrent calls are coalesced: the send is deferred briefly so that changes queued
+        in the meantime ride along in the same request. Each call returns only once its changes
+        have been delivered, and errors from the send propagate to every waiting caller.
+
+        Args:
+            immediate: True to skip the coalescing delay and send pending changes right away.
         """
-        p = self._diff()
-        if p:
-            logger.debug(p)
-            await self.site._save(self.url, p)
+        # Flushes are strictly serial: a new flush is scheduled only once the previous one is
+        # done, and re-checking _changes afterwards covers changes a running flush missed.
+        while len(self._changes):
+            task = self._save_task
+            if task is None or task.done():
+                self._skip_delay = asyncio.Event()
+                task = self._save_task = asyncio.ensure_future(self._flush())
+            if immediate:
+                self._skip_delay.set()
+            await task
+
+    async def _flush(self):
+        try:
+            try:
+                await asyncio.wait_for(self._skip_delay.wait(), self._save_delay)
+            except asyncio.TimeoutError:
+                pass
+            p = self._diff()
+            if p:
+                logger.debug(p)
+                await self.site._save(self.url, p)
+        finally:
+            self._save_task = None
 
 
 class Site:
@@ -615,6 +712,7 @@ class Site:
         self._http = httpx.Client(
             auth=(_config.hub_access_key_id, _config.hub_access_key_secret),
             verify=False,
+            limits=_connection_limits,
         )
 
     def __getitem__(self, url) -> Page:
@@ -624,7 +722,7 @@ class Site:
         page = self[key]
         page.drop()
 
-    def _save(self, url: str, patch: str):
+    def _save(self, url: str, patch: bytes):
         res = self._http.patch(f'{_config.hub_address}{url}', content=patch)
         if res.status_code != 200:
             raise ServiceError(f'Request failed (code={res.status_code}): {res.text}')
@@ -654,8 +752,21 @@ class Site:
         Returns:
             A list of remote URLs for the uploaded files, in order.
         """
+        if len(files) > 1:
+            # Upload files concurrently, one request each; the pooled client is thread-safe.
+            with ThreadPoolExecutor(max_workers=min(len(files), 8)) as pool:
+                return [url for urls in pool.map(self._upload, [[f] for f in files]) for url in urls]
+        return self._upload(files)
+
+    def _upload(self, files: List[str]) -> List[str]:
         upload_url = f'{_config.hub_address}/_f'
-        res = self._http.post(upload_url, files=[('files', (os.path.basename(f), open(f, 'rb'))) for f in files])
+        fs = [open(f, 'rb') for f in files]
+        try:
+            res = self._http.post(
+                upload_url, files=[('files', (os.path.basename(f), fp)) for f, fp in zip(files, fs)])
+        finally:
+            for fp in fs:
+                fp.close()
         if res.status_code == 200:
             return json.loads(res.text)['files']
         raise ServiceError(f'Upload failed (code={res.status_code}): {res.text}')
@@ -675,7 +786,8 @@ class Site:
         # If path is a directory, get basename from url
         filepath = os.path.join(path, os.path.basename(url)) if os.path.isdir(path) else path
 
-        with open(filepath, 'wb') as f:
+        # A large write buffer coalesces the small chunks coming off the stream into few syscalls.
+        with open(filepath, 'wb', buffering=_download_buffer_size) as f:
             with self._http.stream('GET', f'{_config.hub_address}{url}') as r:
                 for chunk in r.iter_bytes():
                     f.write(chunk)
@@ -743,6 +855,7 @@ class AsyncSite:
         self._http = httpx.AsyncClient(
             auth=(_config.hub_access_key_id, _config.hub_access_key_secret),
             verify=False,
+            limits=_connection_limits,
         )
 
     def __getitem__(self, url) -> AsyncPage:
@@ -752,7 +865,7 @@ class AsyncSite:
         page = self[key]
         page.drop()
 
-    async def _save(self, url: str, patch: str):
+    async def _save(self, url: str, patch: bytes):
         res = await self._http.patch(f'{_config.hub_address}{url}', content=patch)
         if res.status_code != 200:
             raise ServiceError(f'Request failed (code={res.status_code}): {res.text}')
@@ -782,8 +895,21 @@ class AsyncSite:
         Returns:
             A list of remote URLs for the uploaded files, in order.
         """
+        if len(files) > 1:
+            # Upload files concurrently, one request each.
+            results = await asyncio.gather(*[self._upload([f]) for f in files])
+            return [url for urls in results for url in urls]
+        return await self._upload(files)
+
+    async def _upload(self, files: List[str]) -> List[str]:
         upload_url = f'{_config.hub_address}/_f'
-        res = await self._http.post(upload_url, files=[('files', (os.path.basename(f), open(f, 'rb'))) for f in files])
+        fs = [open(f, 'rb') for f in files]
+        try:
+            res = await self._http.post(
+                upload_url, files=[('files', (os.path.basename(f), fp)) for f, fp in zip(files, fs)])
+        finally:
+            for fp in fs:
+                fp.close()
         if res.status_code == 200:
             return json.loads(res.text)['files']
         raise ServiceError(f'Upload failed (code={res.status_code}): {res.text}')
@@ -802,7 +928,8 @@ class AsyncSite:
         # If path is a directory, get basename from url
         filepath = os.path.join(path, os.path.basename(url)) if os.path.isdir(path) else path
 
-        with open(filepath, 'wb') as f:
+        # A large write buffer coalesces the small chunks coming off the stream into few syscalls.
+        with open(filepath, 'wb', buffering=_download_buffer_size) as f:
             async with self._http.stream('GET', f'{_config.hub_address}{url}') as r:
                 async for chunk in r.aiter_bytes():
                     f.write(chunk)
@@ -862,6 +989,11 @@ def _kv(key: str, index: str, value: Any):
     return dict(k=key, v=value) if index is None or index == '' else dict(k=key, i=index, v=value)
 
 
+# Built once: json.dumps() constructs a fresh encoder on every call when non-default
+# arguments are passed.
+_json_encoder = json.JSONEncoder(allow_nan=False, separators=(',', ':'))
+
+
 def marshal(d: Any) -> str:
     """
     Marshal to JSON.
@@ -872,7 +1004,20 @@ def marshal(d: Any) -> str:
     Returns:
         A string containing the JSON-serialized form.
     """
-    return json.dumps(d, allow_nan=False, separators=(',', ':'))
+    if orjson is not None:
+        # orjson emits compact output like the stdlib encoder above, but serializes non-finite
+        # floats (NaN, Infinity) as null, whereas the stdlib path raises ValueError. Rejecting
+        # them up front would mean walking the whole payload, which forfeits the encoder win.
+        return orjson.dumps(d, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return _json_encoder.encode(d)
+
+
+def _marshal_bytes(d: Any) -> bytes:
+    # Like marshal(), but keeps the payload as UTF-8 bytes so the network path skips
+    # a decode+encode round trip. Non-finite floats behave as described in marshal().
+    if orjson is not None:
+        return orjson.dumps(d, option=orjson.OPT_NON_STR_KEYS)
+    return _json_encoder.encode(d).encode('utf-8')
 
 
 def unmarshal(s: str) -> Any:
@@ -885,7 +1030,7 @@ def unmarshal(s: str) -> Any:
     Returns:
         The deserialized object or value.
     """
-    return json.loads(s)
+    return orjson.loads(s) if orjson is not None else json.loads(s)
 
 
 def pack(data: Any) -> str:
@@ -0,0 +1,74 @@
+# Copyright 2020 H2O.ai, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from h2o_wave import data
+from h2o_wave.core import PageBase, unmarshal
+
+
+def diff_ops(page: PageBase):
+    d = page._diff()
+    return unmarshal(d)['d'] if d else []
+
+
+def test_diff_empty():
+    page = PageBase('/test')
+    assert page._diff() is None
+
+
+def test_rewrite_same_key_keeps_last_op():
+    page = PageBase('/test')
+    ref = page['card1']
+    ref.value = 1
+    ref.value = 2
+    ref.value = 3
+    assert diff_ops(page) == [dict(k='card1 value', v=3)]
+
+
+def test_rewrite_preserves_last_write_order():
+    page = PageBase('/test')
+    page['card1'].value = 1
+    page['card1'] = dict(a=42)
+    page['card1'].value = 2
+    assert diff_ops(page) == [
+        dict(k='card1', d=dict(a=42)),
+        dict(k='card1 value', v=2),
+    ]
+
+
+def test_delete_discards_queued_writes():
+    page = PageBase('/test')
+    page['card1'].value = 1
+    page['card2'].value = 2
+    del page['card1']
+    assert diff_ops(page) == [
+        dict(k='card2 value', v=2),
+        dict(k='card1'),
+    ]
+
+
+def test_drop_ops_do_not_collide():
+    page = PageBase('/test')
+    page.drop()
+    page['card1'] = dict(a=1)
+    page.drop()
+    assert diff_ops(page) == [{}, dict(k='card1', d=dict(a=1)), {}]
+
+
+def test_data_dump_is_cached_and_invalidated():
+    d = data('a b c', 3)
+    dump = d.dump()
+    dump['k'] = 'card1 data'
+    assert d.dump() == dict(f=dict(f=['a', 'b', 'c'], n=3))
+    d.size = -3
+    assert d.dump() == dict(c=dict(f=['a', 'b', 'c'], n=3))